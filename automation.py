@@ -1,34 +1,111 @@
-import json
+import os
 import time
+import queue
+import threading
+import random
+import asyncio
+import aiohttp
 import pickle 
 import argparse
 import requests
-import subprocess
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from keys import *
 import pandas as pd
-from typing import Dict, Any, Tuple, List
+from diskcache import Cache
+from urllib.parse import quote_plus
+from typing import Dict, Any, Tuple, List, Iterable, Iterator, Optional, Union
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from duckduckgo_search import DDGS
 from duckduckgo_search.exceptions import DuckDuckGoSearchException
+from scraper import run_scrape, SCRAPE_TIMEOUT, LLM_MAX_RETRIES
+
+# Number of concurrent searches/scrapes; the work is I/O-bound, so threads suffice
+MAX_WORKERS = int(os.environ.get("NP_PARALLEL", "8"))
+# Seconds after which get_np_info stops waiting for a scrape. This is only a backstop, so by default
+# it exceeds the sum of the scraper's own timeouts: one page load plus every LLM attempt
+SCRAPE_DEADLINE = float(os.environ.get("NP_DEADLINE", SCRAPE_TIMEOUT * (2 + LLM_MAX_RETRIES) + 30))
+
+# Columns of the non-profit associations database
+DB_COLUMNS = ['name', 'location', 'description', 'size', 'contacts', 'social_media', 'link']
+# Columns written when streaming to CSV: the database columns plus the extra fields asked in NP_PROMPT
+CSV_COLUMNS = DB_COLUMNS + ['type', 'linkedin']
+_CSV_SCHEMA = pa.schema([(column, pa.string()) for column in CSV_COLUMNS])
+# Number of rows buffered before being written to the CSV file
+FLUSH_EVERY = 10
+
+NP_PROMPT = "find these infos about the no-profit organization:\
+              name, location, type, description, size, contacts, linkedin.\
+              For linkedin, give the link;\
+              for type, select the field where the no-prift operates, e.g. health, environment, etc. Keep it to one, max two words."
+
+# Persistent on-disk cache for search and scrape results, shared across runs
+CACHE_EXPIRE = 7 * 86400
+_CACHE = Cache(os.environ.get("NP_CACHE_DIR", ".np_cache"))
+
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+_DDG_TEMPLATE = "https://duckduckgo.com/?t=h_&q={}&ia=web"
+
+# Retry policy for HTTP API calls
+MAX_HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# Shared HTTP session so that repeated API calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=max(32, MAX_WORKERS),
+                                       max_retries=Retry(total=MAX_HTTP_RETRIES, backoff_factor=HTTP_BACKOFF,
+                                                         status_forcelist=RETRY_STATUSES)))
+
+def refresh_cache(verbose: bool=False) -> None:
+    """
+    Evict all cached search and scrape results, forcing them to be fetched again.
+
+    Args:
+        verbose (bool, optional): Enable verbose output. Defaults to False.
+    """
+    n_evicted = _CACHE.evict('search') + _CACHE.evict('scrape')
+    if verbose:
+        print(f'Cache refreshed, {n_evicted} entries evicted.')
+
+@_CACHE.memoize(expire=CACHE_EXPIRE, tag='scrape')
+def cached_scrape(prompt: str, source: str) -> Dict:
+    """
+    Run the scraper, reusing the result of a previous run on the same prompt and source.
+
+    Args:
+        prompt (str): The prompt for the scraper.
+        source (str): The source URL for the scraper.
 
+    Returns:
+        Dict: The result of the scraping pipeline.
+    """
+    return run_scrape(prompt, source)
 
 def save_dict(dictionary: Dict, dictionary_name: str, verbose: bool=False) -> None:
     """
-    Save a dictionary to a pickle file.
+    Save a {name: link} dictionary to a Feather file.
 
     Args:
         dictionary (Dict): The dictionary to save.
         dictionary_name (str): The name of the file to save the dictionary to.
         verbose (bool, optional): Enable verbose output. Defaults to False.
     """
-    with open(f'{dictionary_name}.pkl', 'wb') as f:
-        pickle.dump(dictionary, f)
+    table = pa.Table.from_pydict({'name': list(dictionary.keys()),
+                                  'link': list(dictionary.values())})
+    feather.write_feather(table, f'{dictionary_name}.feather')
     if verbose:
-        print(f'Dictionary saved as "{dictionary_name}.pkl"')
+        print(f'Dictionary saved as "{dictionary_name}.feather"')
 
 def load_dict(dictionary_name: str) -> Dict:
     """
-    Load a dictionary from a pickle file.
+    Load a dictionary from a Feather file, falling back to a legacy pickle file.
 
     Args:
         dictionary_name (str): The name of the file to load the dictionary from.
@@ -36,10 +113,17 @@ def load_dict(dictionary_name: str) -> Dict:
     Returns:
         Dict: The loaded dictionary.
     """
+    if os.path.exists(f'{dictionary_name}.feather'):
+        table = feather.read_table(f'{dictionary_name}.feather')
+        return dict(zip(table['name'].to_pylist(), table['link'].to_pylist()))
+
     with open(f'{dictionary_name}.pkl', 'rb') as f:
         loaded_dict = pickle.load(f)
     return loaded_dict
 
+# The API key is left out of the cache key: it must not be stored on disk, and rotating it
+# should not invalidate the cached searches
+@_CACHE.memoize(expire=CACHE_EXPIRE, tag='search', ignore=(1, 'api_key'))
 def google_search(query: str, api_key: str, search_engine_id: str, **kwargs: Any) -> Dict:
     """
     Perform a Google search using the Custom Search JSON API.
@@ -52,8 +136,10 @@ def google_search(query: str, api_key: str, search_engine_id: str, **kwargs: Any
 
     Returns:
         Dict: JSON response from the Google Custom Search API.
+
+    Raises:
+        requests.HTTPError: If the API answers with an error status.
     """
-    url = "https://www.googleapis.com/customsearch/v1"
     params = {
         'q': query,
         'key': api_key,
@@ -61,10 +147,86 @@ def google_search(query: str, api_key: str, search_engine_id: str, **kwargs: Any
         **kwargs
     }
     
-    response = requests.get(url, params=params)
+    response = _SESSION.get(GOOGLE_SEARCH_URL, params=params, timeout=10)
+    # Raise on error responses so that they are not cached as results
+    response.raise_for_status()
     return response.json()
 
-def get_links(query: str, api_key: str, search_engine_id: str, lim: int = 1, **kwargs: Any) -> str:
+async def _google_one(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, query: str,
+                      api_key: str, search_engine_id: str) -> Dict:
+    """
+    Perform a single Google search on an open aiohttp session, with the same retry policy as _SESSION:
+    connection errors, timeouts and RETRY_STATUSES responses are retried with exponential backoff.
+    Other error responses raise aiohttp.ClientResponseError.
+    """
+    params = {'q': query, 'key': api_key, 'cx': search_engine_id}
+    for attempt in range(MAX_HTTP_RETRIES + 1):
+        last = attempt == MAX_HTTP_RETRIES
+        try:
+            # The timeout starts once a connection slot is free, so queued requests don't expire
+            async with semaphore:
+                async with session.get(GOOGLE_SEARCH_URL, params=params,
+                                       timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status not in RETRY_STATUSES or last:
+                        response.raise_for_status()
+                        return await response.json()
+        except aiohttp.ClientResponseError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if last:
+                raise
+        await asyncio.sleep(HTTP_BACKOFF * (2 ** attempt))
+
+async def _google_gather(queries: List[str], api_key: str, search_engine_id: str) -> List[Any]:
+    """
+    Perform the Google searches concurrently over a shared connection pool of 16 connections.
+    """
+    semaphore = asyncio.Semaphore(16)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=16)) as session:
+        return await asyncio.gather(*[_google_one(session, semaphore, q, api_key, search_engine_id)
+                                      for q in queries], return_exceptions=True)
+
+def google_search_many(queries: List[str], api_key: str, search_engine_id: str) -> List[Dict]:
+    """
+    Perform several Google searches at once, reusing cached results when available.
+
+    Args:
+        queries (List[str]): The search queries.
+        api_key (str): API key for the Google Custom Search JSON API.
+        search_engine_id (str): Search engine ID to use for the search.
+
+    Returns:
+        List[Dict]: JSON responses from the Google Custom Search API, in the order of the queries.
+    """
+    # Each distinct query is looked up only once
+    unique = list(dict.fromkeys(queries))
+    # Same cache entries as google_search, keyed on (query, search_engine_id) only
+    keys = [google_search.__cache_key__(q, None, search_engine_id) for q in unique]
+    results = [_CACHE.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if missing:
+        fetched = asyncio.run(_google_gather([unique[i] for i in missing], api_key, search_engine_id))
+        for i, result in zip(missing, fetched):
+            # Failed searches are left out of the cache so that they are retried on the next run
+            if isinstance(result, Exception) or 'error' in result:
+                print(f'Google search failed for {unique[i]}: {result}')
+                results[i] = {}
+            else:
+                _CACHE.set(keys[i], result, expire=CACHE_EXPIRE, tag='search')
+                results[i] = result
+
+    by_query = dict(zip(unique, results))
+    return [by_query[q] for q in queries]
+
+def _first_link(results: Dict) -> Optional[str]:
+    """
+    Get the first link from a Google search response, or None when it has no results.
+    """
+    items = results.get('items') or []
+    return items[0]['link'] if items else None
+
+def get_links(query: str, api_key: str, search_engine_id: str, lim: int = 1, **kwargs: Any) -> Optional[str]:
     """
     Get the first link from the Google search results.
 
@@ -76,12 +238,15 @@ def get_links(query: str, api_key: str, search_engine_id: str, lim: int = 1, **k
         **kwargs: Additional parameters for the search.
 
     Returns:
-        str: The first link from the search results.
+        Optional[str]: The first link from the search results, or the DuckDuckGo result if there is
+            none (None if DuckDuckGo has no result either).
     """
     results = google_search(query, api_key, search_engine_id, **kwargs)
-    return results.get('items', [])[0]['link']
+    link = _first_link(results)
+    return link if link is not None else _cached_ddg(query)
 
-def duckduckgo_search(query: str, **kwargs: Any) -> str:
+@_CACHE.memoize(expire=CACHE_EXPIRE, tag='search')
+def duckduckgo_search(query: str, **kwargs: Any) -> Optional[str]:
     """
     Perform a search using the DuckDuckGo Instant Answer API with a backoff mechanism.
 
@@ -90,7 +255,7 @@ def duckduckgo_search(query: str, **kwargs: Any) -> str:
         **kwargs: Additional parameters for the search.
 
     Returns:
-        str: URL of the first search result.
+        Optional[str]: URL of the first search result, or None if there are no results.
     """
     max_retries = 10
     initial_delay = 5
@@ -99,19 +264,20 @@ def duckduckgo_search(query: str, **kwargs: Any) -> str:
         try:
             results = DDGS().text(f'{query} BC', region='ca-en', safesearch='off', 
                                   timelimit='n', max_results=1)
-            return results[0]['href']
+            return results[0]['href'] if results else None
         except DuckDuckGoSearchException as e:
-            if "Ratelimit" in str(e) and attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)  # Exponential backoff
-                print(f"Rate limit hit. Waiting {delay} seconds before retrying...")
-                time.sleep(delay)
-            else:
+            if attempt == max_retries - 1:
                 raise
+            # Exponential backoff with jitter, so that concurrent workers don't retry in lockstep
+            delay = min(60, initial_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+            print(f"Search failed ({e}). Waiting {delay:.1f} seconds before retrying...")
+            time.sleep(delay)
     raise DuckDuckGoSearchException("Max retries reached. Unable to complete search.")
 
+@_CACHE.memoize(expire=CACHE_EXPIRE, tag='search')
 def scrap_link(association: str) -> str:
     """
-    Scrape the link of an association using a subprocess call to scraper.py.
+    Scrape the link of an association with the in-process scraper.
 
     Args:
         association (str): The name of the association.
@@ -119,17 +285,45 @@ def scrap_link(association: str) -> str:
     Returns:
         str: The scraped link of the association.
     """
-    source_link = f'https://duckduckgo.com/?t=h_&q={association.replace(" ", "+")}&ia=web'
+    source_link = _DDG_TEMPLATE.format(quote_plus(association))
     prompt = f"find the link of {association}"
     
-    result = subprocess.run(['python3', 'scraper.py', '-prompt', prompt, 
-                             '-source', source_link],
-                            capture_output=True, text=True)
-    l1 = result.stdout
-    l2 = json.loads(l1)
-    link = l2['link']
+    result = run_scrape(prompt, source_link)
+    link = result['link']
     return link
 
+@lru_cache(maxsize=1024)
+def _cached_ddg(query: str) -> Optional[str]:
+    """
+    In-process cache of duckduckgo_search on top of the disk cache.
+    """
+    return duckduckgo_search(query)
+
+@lru_cache(maxsize=1024)
+def _cached_scrap_link(association: str) -> str:
+    """
+    In-process cache of scrap_link on top of the disk cache.
+    """
+    return scrap_link(association)
+
+def search_link(association: str, search_engine: str="ddg") -> Any:
+    """
+    Search the link of an association with the given search engine.
+
+    Args:
+        association (str): The name of the association.
+        search_engine (str, optional): Search engine to use for the search.
+
+    Returns:
+        Any: The link of the association, or None if the search engine is not supported.
+    """
+    if search_engine == 'google':
+        return get_links(association, search_api_key, search_engine_id)
+    elif search_engine == 'ddg':
+        return _cached_ddg(association)
+    elif search_engine == 'gemini':
+        return _cached_scrap_link(association)
+
 def find_websites(source_link: str, search_engine="ddg", verbose : bool=False) -> tuple:
     """
     Find the names and links of the first n associations from the source link.
@@ -144,37 +338,58 @@ def find_websites(source_link: str, search_engine="ddg", verbose : bool=False) -
 
     prompt = f"find the names of all the associations listed in the website {source_link}"
     
-    result = subprocess.run(['python3', 'scraper.py', '-prompt', prompt, 
-                             '-source', source_link],
-                            capture_output=True, text=True)
+    try:
+        resdict = run_scrape(prompt, source_link)
+    except Exception as e:
+        return str(e)
     if verbose:
         print(f'Finding the names of the associations done.')
 
-    if result.stdout:
-        resdict = json.loads(result.stdout)
-        NPs_names = resdict[list(resdict.keys())[0]]
-    else:
-        return result.stderr
+    NPs_names = next(iter(resdict.values()))
     
-    NPs_links = {}
-    for n in range(len(NPs_names)):
-        np = NPs_names[n]
-        print(f'{n+1}/{len(NPs_names)} | {np}')
-        if search_engine == 'google':
-            NPs_links[np] = google_search(np, search_api_key, search_engine_id, lim=1)
-        elif search_engine == 'ddg':
-            NPs_links[np] = duckduckgo_search(np)
-        elif search_engine == 'gemini':
-            NPs_links[np] = scrap_link(np)
+    unique = list(dict.fromkeys(NPs_names))
+    results = {}
+    if search_engine == 'google':
+        # Google searches are plain HTTP calls, so they are batched on a single event loop
+        for np, result in zip(unique, google_search_many(unique, search_api_key, search_engine_id)):
+            link = _first_link(result)
+            if link is not None:
+                results[np] = link
+        print(f'{len(results)}/{len(unique)} | Google searches done')
+
+    # Names without a Google result fall back to DuckDuckGo
+    pool_engine = 'ddg' if search_engine == 'google' else search_engine
+    todo = [np for np in unique if np not in results]
+    if todo:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+            futures = {ex.submit(search_link, np, pool_engine): np for np in todo}
+            for n, fut in enumerate(as_completed(futures)):
+                np = futures[fut]
+                print(f'{n+1}/{len(futures)} | {np}')
+                # A failed search only loses its own link
+                try:
+                    results[np] = fut.result()
+                except Exception as e:
+                    print(f'Search failed for {np}: {e}')
+                    results[np] = None
+
+    # Keep the links in the same order as the names
+    NPs_links = {np: results[np] for np in NPs_names if results[np] is not None}
     
     if verbose:
         print(f'Finding the links of the associations done.')
 
     return NPs_names, NPs_links
 
-def get_np_info(limit: int, links: List[str], NPs_names: List[str], verbose: bool=False) -> Dict:
+def get_np_info(limit: int, links: List[str], NPs_names: List[str],
+                verbose: bool=False) -> Iterator[Tuple[str, Dict]]:
     """
-    Get information about non-profit organizations.
+    Get information about non-profit organizations, yielding each one as soon as it and all the
+    ones before it are scraped.
+
+    Scrapes run concurrently on MAX_WORKERS workers, but the organizations come in the order of
+    NPs_names. Failed scrapes, and scrapes running for longer than SCRAPE_DEADLINE seconds, are
+    reported and skipped.
 
     Args:
         limit (int): Limit for the number of items to process.
@@ -182,51 +397,145 @@ def get_np_info(limit: int, links: List[str], NPs_names: List[str], verbose: boo
         NPs_names (List[str]): List of names of the non-profit organizations.
         verbose (bool, optional): Enable verbose output. Defaults to False.
 
-    Returns:
-        Dict: Dictionary containing information about the non-profit organizations.
+    Yields:
+        Tuple[str, Dict]: Name and information of a non-profit organization.
     """
-    NPs_dict = {}
-    prompt = "find these infos about the no-profit organization:\
-              name, location, type, description, size, contacts, linkedin.\
-              For linkedin, give the link;\
-              for type, select the field where the no-prift operates, e.g. health, environment, etc. Keep it to one, max two words."
-    
+    todo = queue.Queue()
     for n in range(limit):
-        source_link = links[n]
-        name = NPs_names[n]
-        result = subprocess.run(['python3', 'scraper.py', '-prompt', prompt, 
-                                 '-source', source_link],
-                                capture_output=True, text=True)
-        
-        if result.stdout:
-            NPs_dict[name] = json.loads(result.stdout)
-            NPs_dict[name]['name'] = name
-            NPs_dict[name]['link'] = source_link.rsplit('/', 1)[0]
-        else:
-            print(f"{n+1}/{limit} | {name}\n{result.stderr}")
-        
-        if verbose:
-            print(f'{n+1}/{limit} | done with {name}')
-
-    return NPs_dict
-
-def create_database(NPs_dict: Dict, verbose: bool=False) -> pd.DataFrame:
-    """
-    Create a database from the given dictionary of non-profit associations.
+        todo.put(n)
+    finished = queue.Queue()
+    started = {}
+    stop = threading.Event()
+
+    def worker() -> None:
+        while not stop.is_set():
+            try:
+                n = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[n] = time.monotonic()
+            try:
+                finished.put((n, cached_scrape(NP_PROMPT, links[n]), None))
+            except Exception as e:
+                finished.put((n, None, e))
+
+    # A fixed pool of daemon workers: a worker stuck past the deadline keeps its slot until its
+    # scrape returns, but cannot keep the interpreter alive at exit
+    for _ in range(min(MAX_WORKERS, limit)):
+        threading.Thread(target=worker, daemon=True).start()
+
+    pending = set(range(limit))
+    i = 0
+    # Reorder buffer: index -> record, or None for failed scrapes, until all earlier ones are out
+    outcomes = {}
+    next_out = 0
+    try:
+        while pending:
+            try:
+                n, record, error = finished.get(timeout=1)
+            except queue.Empty:
+                n = None
+
+            # Results of abandoned scrapes are discarded
+            if n in pending:
+                pending.discard(n)
+                i += 1
+                name = NPs_names[n]
+                if error is None:
+                    record['name'] = name
+                    record['link'] = links[n].rsplit('/', 1)[0]
+                    outcomes[n] = record
+                else:
+                    outcomes[n] = None
+                    print(f"{i}/{limit} | {name}\n{error}")
+
+                if verbose:
+                    print(f'{i}/{limit} | done with {name}')
+
+            # Stop waiting for scrapes past the deadline; queued ones have no start time yet
+            now = time.monotonic()
+            for n in [n for n in pending if n in started and now - started[n] > SCRAPE_DEADLINE]:
+                pending.discard(n)
+                i += 1
+                outcomes[n] = None
+                print(f"{i}/{limit} | {NPs_names[n]}\nTimed out after {SCRAPE_DEADLINE} seconds")
+
+            while next_out in outcomes:
+                record = outcomes.pop(next_out)
+                if record is not None:
+                    yield NPs_names[next_out], record
+                next_out += 1
+    finally:
+        stop.set()
+
+def stream_np_info(limit: int, links: List[str], NPs_names: List[str], path: str,
+                   verbose: bool=False) -> str:
+    """
+    Get information about non-profit organizations and write it to a CSV file as it is scraped.
+
+    Args:
+        limit (int): Limit for the number of items to process.
+        links (List[str]): List of links to the non-profit organizations.
+        NPs_names (List[str]): List of names of the non-profit organizations.
+        path (str): Path to database directory.
+        verbose (bool, optional): Enable verbose output. Defaults to False.
+
+    Returns:
+        str: Path of the CSV file.
+    """
+    filename = db_filename(path)
+    rows = []
+    with pacsv.CSVWriter(filename, _CSV_SCHEMA) as writer:
+        try:
+            for name, record in get_np_info(limit, links, NPs_names, verbose):
+                rows.append(_db_row(name, record))
+                if len(rows) == FLUSH_EVERY:
+                    writer.write_table(_csv_table(rows))
+                    rows = []
+        finally:
+            # Keep whatever was scraped even if the run is interrupted
+            if rows:
+                writer.write_table(_csv_table(rows))
+
+    if verbose:
+        print(f'Database saved as\n"{filename}"')
+
+    return filename
+
+def _db_row(name: str, record: Dict) -> Dict:
+    """
+    Flatten a scraped record into a database row.
+    """
+    row = dict(record)
+    row['contacts'] = str(row.get('contacts', ''))[1:-1]
+    row['name'] = name
+    return row
+
+def _csv_table(rows: List[Dict]) -> pa.Table:
+    """
+    Convert database rows into an Arrow table of strings with the CSV columns.
+    """
+    return pa.Table.from_pylist([{c: None if row.get(c) is None else str(row[c]) for c in CSV_COLUMNS}
+                                 for row in rows], schema=_CSV_SCHEMA)
+
+def create_database(NPs_dict: Union[Dict, Iterable[Tuple[str, Dict]]],
+                    verbose: bool=False) -> pd.DataFrame:
+    """
+    Create a database from the given non-profit associations.
 
     Args:
-        NPs_dict (Dict): Dictionary containing non-profit associations data.
+        NPs_dict (Union[Dict, Iterable[Tuple[str, Dict]]]): Dictionary containing non-profit
+            associations data, or (name, data) pairs such as the ones yielded by get_np_info.
 
     Returns:
         pd.DataFrame: DataFrame containing the non-profit associations data.
     """
-    db = pd.DataFrame(columns=['name', 'location', 'description', 'size', 
-                               'contacts', 'social_media', 'link'])
+    items = NPs_dict.items() if isinstance(NPs_dict, dict) else NPs_dict
+    rows = [_db_row(key, value) for key, value in items]
 
-    for key in NPs_dict.keys():
-        NPs_dict[key]['contacts'] = str(NPs_dict[key]['contacts'])[1:-1]
-        df = pd.DataFrame(NPs_dict[key], index=[0])
-        db = pd.concat([db, df], ignore_index=True)
+    # Known columns first, then any extra field returned by the scraper
+    db = pd.DataFrame(rows)
+    db = db.reindex(columns=DB_COLUMNS + [c for c in db.columns if c not in DB_COLUMNS])
     
     if verbose:
         print('Database created.')
@@ -243,54 +552,60 @@ def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description='Run the automation script with given parameters.')
     parser.add_argument('-n', '--n_associations', type=int, required=True, help='Number of associations to process')
     parser.add_argument('-l', '--limit', type=int, required=True, help='Limit for the number of items to process')
-    parser.add_argument('-s', '--source_link', type=str, required=True, help='Source link for the associations')
+    parser.add_argument('-s', '--source_link', type=str, default=None,
+                        help='Unused: the links are read from the links file in --path. Kept for backward compatibility')
     parser.add_argument('-p', '--path', type=str, default='../', help='Path to database directory')
     parser.add_argument('-v', '--verbose', type=bool, default=False, help='Enable verbose output')
+    parser.add_argument('-r', '--refresh', action='store_true', help='Ignore cached search and scrape results')
     return parser.parse_args()
 
 
+def db_filename(path: str) -> str:
+    """
+    Build the timestamped name of the database CSV file in the given directory.
+    """
+    dt = datetime.now().strftime("%Y%m%d-%H%M")[2:]
+    return f'{path}associations_{dt}.csv'
+
 def save_db(db: pd.DataFrame, path: str, verbose: bool=True) -> None:
     """ 
     Save the database to a CSV file. 
     """ 
-    dt = datetime.now().strftime("%Y%m%d-%H%M")[2:]
-    path = path
-    db.to_csv(f'{path}associations_{dt}.csv', index=False)
+    filename = db_filename(path)
+    db.to_csv(filename, index=False)
     if verbose:
-        print(f'Database saved to "{path}" as\n"associations_{dt}.csv"')
+        print(f'Database saved as\n"{filename}"')
 
 
-def main(n_associations: int, limit: int, path: str, verbose: bool) -> pd.DataFrame:
+def main(n_associations: int, limit: int, path: str, verbose: bool) -> str:
     """
     Main function to run the automation script.
 
     Args:
         n_associations (int): Number of associations to process.
         limit (int): Limit for the number of items to process.
-        source_link (str): Source link for the associations.
+        path (str): Path to database directory, containing the links dictionary.
         verbose (bool): Enable verbose output.
 
     Returns:
-        pd.DataFrame: DataFrame containing the non-profit associations data.
+        str: Path of the CSV file containing the non-profit associations data.
     """
     start = datetime.now()
     dbd = load_dict(f'{path}/links')
-    NPs_names = list(dbd.keys())[:n_associations]
-    links = [f'{dbd[np]}/about' for np in NPs_names]
-    NPs_dict = get_np_info(limit, links, NPs_names, verbose)
-    db = create_database(NPs_dict)
+    items = list(islice(dbd.items(), n_associations))
+    NPs_names = [name for name, _ in items]
+    links = [link + '/about' for _, link in items]
+    filename = stream_np_info(limit, links, NPs_names, path, verbose)
     end = datetime.now()
     
     if verbose:
         print(f'\nTime taken: {end - start}')
     
-    return db
+    return filename
 
 if __name__ == "__main__":
 
     args = parse_arguments()
-    db = main(args.n_associations, args.limit, args.source_link, args.verbose)
-    save_db(db=db, verbose=args.verbose, path=args.path)
-    
-    if args.verbose:
-        print(db)
\ No newline at end of file
+    if args.refresh:
+        refresh_cache(args.verbose)
+    main(args.n_associations, args.limit, args.path, args.verbose)
\ No newline at end of file
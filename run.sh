@@ -1,4 +1,3 @@
-link="https://www.amcnposolutions.com/directory-of-canadian-not-for-profit-associations/bc-a-to-c/"
-database="/path/to/database"
+database="/path/to/database/"
 n_a=50
-python3 automation.py -n $n_a -l $n_a -s $link -p $database -v true
\ No newline at end of file
+python3 automation.py -n $n_a -l $n_a -p $database -v true
\ No newline at end of file
@@ -1,33 +1,91 @@
-import json
+import os
+import sys
+import orjson
 import argparse
+import threading
+from typing import Dict
+from langchain_google_genai import ChatGoogleGenerativeAI
 from scrapegraphai.graphs import SmartScraperGraph
 from keys import *
 
+GEMINI_MODEL = "gemini-1.5-flash-latest"
+# Seconds after which a page load or an LLM call is given up on
+SCRAPE_TIMEOUT = float(os.environ.get("NP_TIMEOUT", "90"))
+# Number of times a failed or timed out LLM call is retried
+LLM_MAX_RETRIES = 2
+
 # Define the configuration for the scraping pipeline
 graph_config = {
     "llm": {
-        "model": "google_genai/gemini-1.5-flash-latest",
+        "model": f"google_genai/{GEMINI_MODEL}",
         "api_key": gemini_api_key,
-        
+        "model_tokens": 128000,
     },
-    "verbose": True,
+    "verbose": False,
     "headless": True,
+    "timeout": SCRAPE_TIMEOUT,
+    "loader_kwargs": {"timeout": SCRAPE_TIMEOUT},
 }
 
-# Parse command-line arguments
-parser = argparse.ArgumentParser(description='Run SmartScraperGraph with given prompt and source.')
-parser.add_argument('-prompt', type=str, required=True, help='The prompt for the scraper')
-parser.add_argument('-source', type=str, required=True, help='The source URL for the scraper')
-args = parser.parse_args()
+# LLM clients are expensive to build, so idle ones are kept in a pool and reused across calls and
+# threads; the pool never grows beyond the peak number of concurrent scrapes
+_llm_pool = []
+_llm_lock = threading.Lock()
+
+def _acquire_llm() -> ChatGoogleGenerativeAI:
+    """
+    Take an idle LLM client from the pool, creating one if none is available.
+    """
+    with _llm_lock:
+        if _llm_pool:
+            return _llm_pool.pop()
+    return ChatGoogleGenerativeAI(model=GEMINI_MODEL, google_api_key=gemini_api_key,
+                                  timeout=SCRAPE_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+
+def _release_llm(llm: ChatGoogleGenerativeAI) -> None:
+    """
+    Return an LLM client to the pool.
+    """
+    with _llm_lock:
+        _llm_pool.append(llm)
+
+def run_scrape(prompt: str, source: str, verbose: bool=False) -> Dict:
+    """
+    Run the SmartScraperGraph pipeline in-process.
+
+    Args:
+        prompt (str): The prompt for the scraper.
+        source (str): The source URL for the scraper.
+        verbose (bool, optional): Enable scrapegraphai's verbose output. Defaults to False.
+
+    Returns:
+        Dict: The result of the scraping pipeline.
+    """
+    llm = _acquire_llm()
+    try:
+        smart_scraper_graph = SmartScraperGraph(
+            prompt=prompt,
+            source=source,
+            config={
+                **graph_config,
+                "llm": {**graph_config["llm"], "model_instance": llm},
+                "verbose": verbose,
+            }
+        )
+        return smart_scraper_graph.run()
+    finally:
+        _release_llm(llm)
+
+if __name__ == "__main__":
 
-# Create the SmartScraperGraph instance
-smart_scraper_graph = SmartScraperGraph(
-    prompt=args.prompt,
-    source=args.source,
-    config=graph_config
-)
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Run SmartScraperGraph with given prompt and source.')
+    parser.add_argument('-prompt', type=str, required=True, help='The prompt for the scraper')
+    parser.add_argument('-source', type=str, required=True, help='The source URL for the scraper')
+    parser.add_argument('-verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
 
-# Run the pipeline
-result = smart_scraper_graph.run()
+    # Run the pipeline
+    result = run_scrape(args.prompt, args.source, args.verbose)
 
-print(json.dumps(result, indent=4))
\ No newline at end of file
+    sys.stdout.buffer.write(orjson.dumps(result) + b'\n')